@@ -2,56 +2,400 @@
 # Módulo que contiene la lógica de propagación del fuego y cálculos relacionados al viento.
 
 import numpy as np
-import random
+from functools import lru_cache
 from math import radians, cos, sin
 
+# Numba es opcional: si está instalado, la propagación se compila a código
+# nativo con hilos; si no, se usa la versión vectorizada de NumPy.
+try:
+    from numba import njit, prange
+    NUMBA_DISPONIBLE = True
+except ImportError:
+    NUMBA_DISPONIBLE = False
+
+# CUDA también es opcional y solo se usa si hay una GPU visible. Para grillas
+# de investigación (≥2048x2048) el stencil en CPU queda limitado por memoria;
+# en la GPU cada hilo resuelve una celda leyendo su vecindario desde memoria
+# compartida.
+try:
+    from numba import cuda, int8 as _nb_int8
+    CUDA_DISPONIBLE = cuda.is_available()
+except Exception:
+    CUDA_DISPONIBLE = False
+
 # Estados posibles de una celda (coherentes con el main)
 VACIO = 0
 VEGETACION = 1
 FUEGO = 2
 QUEMADO = 3
 
+# Generador moderno de NumPy (PCG64): ~2x más rápido que la interfaz heredada
+# np.random.* basada en Mersenne Twister. El buffer de sorteos se reserva una
+# vez y se reutiliza entre horas, creciendo solo si la zona activa lo supera.
+_RNG = np.random.default_rng()
+_rand_buf = np.empty(0, dtype=np.float32)
+
+
+def _sorteo_hora(shape):
+    """
+    Devuelve una matriz de números aleatorios en [0, 1) con la forma pedida.
+
+    Rellena (con rng.random(out=...)) una vista del buffer global en float32:
+    sin reservar memoria nueva por hora y con la mitad del tráfico de memoria
+    que los float64 que devolvía np.random.random.
+    """
+    global _rand_buf
+    n = shape[0] * shape[1]
+    if _rand_buf.size < n:
+        _rand_buf = np.empty(n, dtype=np.float32)
+    vista = _rand_buf[:n]
+    _RNG.random(out=vista, dtype=np.float32)
+    return vista.reshape(shape)
+
+@lru_cache(maxsize=360)
 def direccion_vector(grados):
     """
     Convierte una dirección de viento (en grados) a un vector 2D (dx, dy) redondeado.
+
+    Las direcciones del pronóstico se repiten de hora en hora, así que el
+    resultado se memoriza: la trigonometría se calcula una sola vez por ángulo
+    y las llamadas siguientes devuelven siempre la misma tupla.
     """
     rad = radians(grados)
     return round(cos(rad)), round(sin(rad))
 
 def buscar_vecino(grilla, cx, cy, radio=3):
     """
-    Busca una celda vecina con vegetación dentro de un radio alrededor de (cx, cy).
+    Busca la celda con vegetación más cercana a (cx, cy) dentro de un radio.
+
+    En lugar de sondear celda por celda en Python, recorta la ventana de
+    búsqueda, localiza toda la vegetación con np.where y elige la celda de
+    menor distancia al centro con argmin: una sola pasada a velocidad de C.
+    """
+    # Ventana de búsqueda recortada a los límites de la grilla.
+    y0, y1 = max(0, cy - radio), min(grilla.shape[0], cy + radio + 1)
+    x0, x1 = max(0, cx - radio), min(grilla.shape[1], cx + radio + 1)
+    ys, xs = np.where(grilla[y0:y1, x0:x1] == VEGETACION)
+    if len(xs) == 0:
+        return None, None
+    # Distancia al cuadrado de cada candidata al centro (cx, cy); el argmin
+    # elige la más cercana sin necesidad de la raíz cuadrada.
+    dist = (ys - (cy - y0)) ** 2 + (xs - (cx - x0)) ** 2
+    i = dist.argmin()
+    return x0 + int(xs[i]), y0 + int(ys[i])
+
+def _actualizar_numpy(grilla, viento_dx, viento_dy, velocidad, pendiente, rand_buf):
+    """
+    Propagación vectorizada con NumPy (camino alternativo sin Numba).
+
+    En lugar de recorrer las 600x600 celdas en Python, se trabaja con máscaras
+    booleanas. Para cada uno de los 8 vecinos se desplaza la máscara de fuego
+    con np.roll, se calcula la probabilidad de contagio como un array completo
+    y se sortea contra la matriz aleatoria 'rand_buf', de modo que todo el
+    trabajo por celda ocurre a velocidad de C.
+    """
+    nueva = grilla.copy()
+    # Máscaras de estado: dónde hay fuego y dónde hay combustible disponible.
+    fuego_mask = (grilla == FUEGO)
+    vegetacion_mask = (grilla == VEGETACION)
+    r = rand_buf
+
+    # Las probabilidades solo dependen de la pendiente y el viento de la hora,
+    # no del desplazamiento: se calculan y acotan una única vez por paso en
+    # lugar de rehacer la misma aritmética (y el clamp) en cada uno de los 8
+    # vecinos. Solo el desplazamiento alineado con el viento usa prob_alta.
+    prob_baja = 0.3 + 0.1 * pendiente + 0.01 * velocidad
+    np.minimum(prob_baja, 1.0, out=prob_baja)
+    prob_alta = 0.6 + 0.2 * pendiente + 0.02 * velocidad
+    np.minimum(prob_alta, 1.0, out=prob_alta)
+
+    # Recorre los 8 desplazamientos posibles (solo 8 iteraciones, no 360k).
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dx == 0 and dy == 0:
+                continue
+            # Desplaza la máscara de fuego hacia el vecino (dx, dy): la celda
+            # (y, x) de 'src' queda en True si su vecino (y-dy, x-dx) arde.
+            src = np.roll(fuego_mask, shift=(dy, dx), axis=(0, 1))
+            # np.roll "envuelve" los bordes de la grilla; se anulan las filas
+            # y columnas que dieron la vuelta para no propagar a través de ellos.
+            if dy > 0:
+                src[:dy, :] = False
+            elif dy < 0:
+                src[dy:, :] = False
+            if dx > 0:
+                src[:, :dx] = False
+            elif dx < 0:
+                src[:, dx:] = False
+            # Celdas con vegetación que tienen un foco de fuego en este vecino.
+            candidatas = src & vegetacion_mask
+            # La probabilidad depende de si el desplazamiento coincide con el viento.
+            prob = prob_alta if (dx == viento_dx and dy == viento_dy) else prob_baja
+            # Enciende las candidatas cuyo sorteo quedó por debajo de la probabilidad.
+            nueva[candidatas & (r < prob)] = FUEGO
+
+    # Todo lo que estaba en llamas pasa a QUEMADO.
+    nueva[fuego_mask] = QUEMADO
+    return nueva
+
+
+# Firma explícita del kernel: grilla de estados en int8, viento como enteros,
+# velocidad en float64 y pendiente/sorteos en float32 (layout 'A' porque se
+# reciben vistas de la zona activa). Fijar los tipos por adelantado hace que
+# la compilación sea ansiosa: ocurre una sola vez al importar el módulo (y se
+# cachea en disco entre corridas), sin pagar el JIT en la primera hora, y le
+# permite a LLVM especializar y vectorizar con SIMD el bucle interno de paso 1
+# para estos dtypes exactos.
+_FIRMA_NJIT = 'void(i1[:, :], i1[:, :], i8, i8, f8, f4[:, :], f4[:, :])'
+
+if NUMBA_DISPONIBLE:
+    @njit(_FIRMA_NJIT, parallel=True, cache=True, fastmath=True)
+    def _actualizar_njit(grilla, nueva, viento_dx, viento_dy, velocidad, pendiente, rand_buf):
+        """
+        Kernel de propagación compilado con Numba.
+
+        Recorre la grilla en una sola pasada (sin arrays temporales) con las
+        filas repartidas entre hilos vía prange. Cada celda "mira" a sus 8
+        vecinos en busca de fuego (gather) en lugar de que el fuego escriba en
+        sus vecinos (scatter): así cada hilo escribe únicamente en su propia
+        fila y no hay carreras de datos. Los bucles sobre (-1, 0, 1) los
+        desenrolla el compilador.
+        """
+        alto, ancho = grilla.shape
+        for y in prange(alto):
+            for x in range(ancho):
+                estado = grilla[y, x]
+                if estado == FUEGO:
+                    nueva[y, x] = QUEMADO
+                elif estado == VEGETACION:
+                    for dy in (-1, 0, 1):
+                        for dx in (-1, 0, 1):
+                            if dx == 0 and dy == 0:
+                                continue
+                            ny = y + dy
+                            nx = x + dx
+                            if 0 <= ny < alto and 0 <= nx < ancho and grilla[ny, nx] == FUEGO:
+                                # El vecino (ny, nx) propaga hacia esta celda en la
+                                # dirección (-dx, -dy); se compara con el viento.
+                                if -dx == viento_dx and -dy == viento_dy:
+                                    prob = 0.6 + 0.2 * pendiente[y, x] + 0.02 * velocidad
+                                else:
+                                    prob = 0.3 + 0.1 * pendiente[y, x] + 0.01 * velocidad
+                                if rand_buf[y, x] < min(prob, 1.0):
+                                    nueva[y, x] = FUEGO
+
+
+# Hilos por bloque (por dimensión) para el kernel CUDA: bloques de 16x16 con
+# una tesela de memoria compartida de 18x18 (halo de una celda).
+_TPB_CUDA = 16
+# Tamaño de la zona activa (en celdas) a partir del cual conviene pagar las
+# transferencias host-GPU; por debajo, los kernels de CPU ganan.
+UMBRAL_CELDAS_CUDA = 2048 * 2048
+
+if CUDA_DISPONIBLE:
+    @cuda.jit
+    def _propagar_kernel_cuda(grilla, nueva, viento_dx, viento_dy, velocidad, pendiente, rand_buf):
+        """
+        Kernel CUDA de propagación: un hilo por celda.
+
+        Cada bloque carga cooperativamente su tesela de 16x16 más un halo de
+        una celda en memoria compartida; tras la barrera, cada hilo lee sus 8
+        vecinos desde esa tesela (una sola lectura de memoria global por
+        celda) y aplica la misma regla de contagio que los kernels de CPU.
+        """
+        s = cuda.shared.array(shape=(_TPB_CUDA + 2, _TPB_CUDA + 2), dtype=_nb_int8)
+        alto, ancho = grilla.shape
+        y, x = cuda.grid(2)
+        ty = cuda.threadIdx.x
+        tx = cuda.threadIdx.y
+        ly = ty + 1
+        lx = tx + 1
+        dentro = y < alto and x < ancho
+
+        # Carga de la celda propia y, para los hilos del borde del bloque,
+        # del halo correspondiente (fuera de la grilla se carga VACIO).
+        s[ly, lx] = grilla[y, x] if dentro else VACIO
+        if ty == 0:
+            s[0, lx] = grilla[y - 1, x] if (dentro and y > 0) else VACIO
+        if ty == _TPB_CUDA - 1:
+            s[ly + 1, lx] = grilla[y + 1, x] if (x < ancho and y + 1 < alto) else VACIO
+        if tx == 0:
+            s[ly, 0] = grilla[y, x - 1] if (dentro and x > 0) else VACIO
+        if tx == _TPB_CUDA - 1:
+            s[ly, lx + 1] = grilla[y, x + 1] if (y < alto and x + 1 < ancho) else VACIO
+        if ty == 0 and tx == 0:
+            s[0, 0] = grilla[y - 1, x - 1] if (dentro and y > 0 and x > 0) else VACIO
+        if ty == 0 and tx == _TPB_CUDA - 1:
+            s[0, lx + 1] = grilla[y - 1, x + 1] if (y > 0 and x + 1 < ancho) else VACIO
+        if ty == _TPB_CUDA - 1 and tx == 0:
+            s[ly + 1, 0] = grilla[y + 1, x - 1] if (y + 1 < alto and x > 0) else VACIO
+        if ty == _TPB_CUDA - 1 and tx == _TPB_CUDA - 1:
+            s[ly + 1, lx + 1] = grilla[y + 1, x + 1] if (y + 1 < alto and x + 1 < ancho) else VACIO
+        cuda.syncthreads()
+
+        if not dentro:
+            return
+        estado = s[ly, lx]
+        if estado == FUEGO:
+            nueva[y, x] = QUEMADO
+        elif estado == VEGETACION:
+            for dy in range(-1, 2):
+                for dx in range(-1, 2):
+                    if dx == 0 and dy == 0:
+                        continue
+                    if s[ly + dy, lx + dx] == FUEGO:
+                        # Misma regla que en los kernels de CPU: el vecino
+                        # propaga hacia esta celda en la dirección (-dx, -dy).
+                        if -dx == viento_dx and -dy == viento_dy:
+                            prob = 0.6 + 0.2 * pendiente[y, x] + 0.02 * velocidad
+                        else:
+                            prob = 0.3 + 0.1 * pendiente[y, x] + 0.01 * velocidad
+                        if rand_buf[y, x] < min(prob, 1.0):
+                            nueva[y, x] = FUEGO
+
+    def _actualizar_cuda(grilla, nueva, viento_dx, viento_dy, velocidad, pendiente, rand_buf):
+        """
+        Envoltura de host: transfiere la zona activa a la GPU, lanza el kernel
+        con bloques de 16x16 y copia el resultado de vuelta sobre 'nueva'.
+        """
+        d_grilla = cuda.to_device(np.ascontiguousarray(grilla))
+        d_nueva = cuda.to_device(np.ascontiguousarray(nueva))
+        d_pendiente = cuda.to_device(np.ascontiguousarray(pendiente))
+        d_rand = cuda.to_device(rand_buf)
+        bloques = ((grilla.shape[0] + _TPB_CUDA - 1) // _TPB_CUDA,
+                   (grilla.shape[1] + _TPB_CUDA - 1) // _TPB_CUDA)
+        _propagar_kernel_cuda[bloques, (_TPB_CUDA, _TPB_CUDA)](
+            d_grilla, d_nueva, viento_dx, viento_dy, velocidad, d_pendiente, d_rand)
+        nueva[:] = d_nueva.copy_to_host()
+
+
+def _propagar_zona(sub_grilla, destino, viento_dx, viento_dy, velocidad, sub_pendiente):
+    """
+    Propaga una hora sobre la zona activa, eligiendo el mejor kernel disponible.
+
+    El sorteo aleatorio se genera una sola vez por hora desde Python (el RNG
+    por hilo de Numba es más lento) y del tamaño de la zona, no de la grilla.
+    'destino' debe ser una vista/array del mismo tamaño con el estado inicial
+    ya copiado; el kernel escribe el resultado sobre él.
     """
-    for r in range(1, radio + 1):
-        for dy in range(-r, r + 1):
-            for dx in range(-r, r + 1):
-                nx, ny = cx + dx, cy + dy
-                if 0 <= nx < grilla.shape[1] and 0 <= ny < grilla.shape[0]:
-                    if grilla[ny, nx] == VEGETACION:
-                        return nx, ny
-    return None, None
+    rand_buf = _sorteo_hora(sub_grilla.shape)
+    if CUDA_DISPONIBLE and sub_grilla.size >= UMBRAL_CELDAS_CUDA:
+        # Solo para zonas activas enormes: el kernel GPU amortiza la
+        # transferencia con un hilo por celda y teselas en memoria compartida.
+        _actualizar_cuda(sub_grilla, destino, viento_dx, viento_dy,
+                         float(velocidad), sub_pendiente, rand_buf)
+    elif NUMBA_DISPONIBLE:
+        _actualizar_njit(sub_grilla, destino, viento_dx, viento_dy,
+                         float(velocidad), sub_pendiente, rand_buf)
+    else:
+        destino[:] = _actualizar_numpy(sub_grilla, viento_dx, viento_dy,
+                                       velocidad, sub_pendiente, rand_buf)
+
+
+def _zona_activa(grilla):
+    """
+    Devuelve el rectángulo (y0, y1, x0, x1) que encierra el fuego con un halo
+    de una celda, o None si no queda fuego activo.
+    """
+    ys, xs = np.where(grilla == FUEGO)
+    if len(ys) == 0:
+        return None
+    y0, y1 = max(0, int(ys.min()) - 1), min(grilla.shape[0], int(ys.max()) + 2)
+    x0, x1 = max(0, int(xs.min()) - 1), min(grilla.shape[1], int(xs.max()) + 2)
+    return y0, y1, x0, x1
+
 
 def actualizar(grilla, viento, velocidad, pendiente):
     """
     Propaga el fuego a la siguiente hora según vegetación, pendiente y viento.
+
+    Bloqueo espacial: el fuego solo puede avanzar una celda por hora, así que
+    el kernel se ejecuta únicamente sobre el rectángulo que encierra al frente
+    activo más un halo de una celda, en vez de barrer las 360k celdas. El
+    costo escala con el tamaño del incendio, no con el de la grilla.
     """
     nueva = grilla.copy()
-    for y in range(grilla.shape[0]):
-        for x in range(grilla.shape[1]):
-            if grilla[y, x] == FUEGO:
-                nueva[y, x] = QUEMADO
-                for dy in [-1, 0, 1]:
-                    for dx in [-1, 0, 1]:
-                        nx, ny = x + dx, y + dy
-                        if 0 <= nx < grilla.shape[1] and 0 <= ny < grilla.shape[0]:
-                            if grilla[ny, nx] == VEGETACION:
-                                pend = pendiente[ny, nx]
-                                viento_dx, viento_dy = viento
-                                es_viento = (dx == viento_dx and dy == viento_dy)
-                                if es_viento:
-                                    prob = 0.6 + 0.2 * pend + 0.02 * velocidad
-                                else:
-                                    prob = 0.3 + 0.1 * pend + 0.01 * velocidad
-                                if random.random() < min(prob, 1.0):
-                                    nueva[ny, nx] = FUEGO
+    zona = _zona_activa(grilla)
+    if zona is None:
+        # Sin fuego activo no hay nada que propagar.
+        return nueva
+    y0, y1, x0, x1 = zona
+    viento_dx, viento_dy = viento
+    # Vistas sobre la zona activa (sin copiar la grilla completa).
+    _propagar_zona(grilla[y0:y1, x0:x1], nueva[y0:y1, x0:x1],
+                   viento_dx, viento_dy, velocidad, pendiente[y0:y1, x0:x1])
     return nueva
+
+
+def simular_horas(grilla, velocidades, direcciones, pendiente, horas=None):
+    """
+    Corre varias horas de propagación en lote, sin visualización.
+
+    Pensada para horizontes largos o ensambles de escenarios "qué pasaría si".
+    Aplica bloqueo temporal sobre la zona activa: el rectángulo del frente se
+    localiza una sola vez y luego se expande a lo sumo una celda por hora (el
+    avance máximo posible), de modo que las horas consecutivas trabajan sobre
+    el mismo bloque residente en caché, sin re-escanear la grilla completa ni
+    copiarla entera en cada paso.
+
+    Devuelve una grilla nueva con el estado final; la de entrada no se modifica.
+    """
+    if horas is None:
+        horas = min(len(velocidades), len(direcciones))
+    grilla = grilla.copy()
+    zona = _zona_activa(grilla)
+    if zona is None:
+        return grilla
+    y0, y1, x0, x1 = zona
+
+    for hora in range(horas):
+        viento_dx, viento_dy = direccion_vector(direcciones[hora])
+        sub_grilla = grilla[y0:y1, x0:x1]
+        # Copia solo la zona activa como buffer de escritura de esta hora.
+        destino = sub_grilla.copy()
+        _propagar_zona(sub_grilla, destino, viento_dx, viento_dy,
+                       velocidades[hora], pendiente[y0:y1, x0:x1])
+        grilla[y0:y1, x0:x1] = destino
+        # Expande la zona una celda por lado: cubre cualquier avance posible
+        # de la próxima hora sin volver a buscar el fuego en toda la grilla.
+        y0, y1 = max(0, y0 - 1), min(grilla.shape[0], y1 + 1)
+        x0, x1 = max(0, x0 - 1), min(grilla.shape[1], x1 + 1)
+
+    return grilla
+
+
+def empaquetar_grilla(grilla):
+    """
+    Empaqueta una grilla de estados a 2 bits por celda (4 celdas por byte).
+
+    Los cuatro estados (VACIO..QUEMADO) caben en 2 bits, así que una grilla de
+    600x600 pasa de 360 kB en int8 a 90 kB: útil para guardar historiales o
+    ensambles de escenarios en memoria o disco sin pagar 4 veces su tamaño.
+    La grilla viva de la simulación se mantiene en int8 porque los kernels de
+    propagación necesitan celdas direccionables byte a byte.
+    """
+    plano = np.ascontiguousarray(grilla, dtype=np.uint8).reshape(-1)
+    # Se rellena con VACIO hasta un múltiplo de 4 para agrupar de a cuartetos.
+    resto = plano.size % 4
+    if resto:
+        plano = np.concatenate([plano, np.full(4 - resto, VACIO, dtype=np.uint8)])
+    cuartetos = plano.reshape(-1, 4)
+    # Cada celda ocupa su par de bits dentro del byte: operaciones de
+    # desplazamiento y OR vectorizadas, sin bucles por celda.
+    return (cuartetos[:, 0]
+            | (cuartetos[:, 1] << 2)
+            | (cuartetos[:, 2] << 4)
+            | (cuartetos[:, 3] << 6))
+
+
+def desempaquetar_grilla(empaquetada, shape):
+    """
+    Reconstruye una grilla de estados int8 desde su forma empaquetada a 2 bits.
+    """
+    celdas = np.empty((empaquetada.size, 4), dtype=np.int8)
+    celdas[:, 0] = empaquetada & 0b11
+    celdas[:, 1] = (empaquetada >> 2) & 0b11
+    celdas[:, 2] = (empaquetada >> 4) & 0b11
+    celdas[:, 3] = (empaquetada >> 6) & 0b11
+    # Descarta el relleno final y recupera la forma original.
+    return celdas.reshape(-1)[:shape[0] * shape[1]].reshape(shape)
@@ -21,11 +21,14 @@ import imageio  # Para crear el archivo GIF animado a partir de los fotogramas g
 import os  # Para interactuar con el sistema operativo, como crear directorios.
 import geopandas as gpd  # Para manejar datos geoespaciales vectoriales y exportar a Shapefile (SHP).
 import cv2  # (OpenCV) Para procesar los fotogramas y exportar el video en formato MP4.
-from shapely.geometry import Polygon, Point  # Para crear geometrías (polígonos, puntos) que se usarán con Geopandas.
+from shapely.geometry import shape, Point  # Para crear geometrías (polígonos, puntos) que se usarán con Geopandas.
+from shapely.ops import unary_union  # Para unir los polígonos quemados directamente en GEOS, sin pasar por una GeoSeries.
 from raster_utils import cargar_raster, cargar_savi  # Módulos auxiliares para cargar y pre-procesar los datos raster.
 from PIL import Image  # (Pillow) Para manipular imágenes, como el mapa de fondo.
 from rasterio.transform import from_bounds  # Para crear la transformación afín desde los límites del raster.
+from rasterio.features import shapes  # Para vectorizar la máscara de celdas quemadas en una sola pasada en C.
 from fuego import direccion_vector, buscar_vecino, actualizar  # Módulo con la lógica principal de la propagación del fuego.
+from concurrent.futures import ThreadPoolExecutor  # Para pedir el pronóstico de viento en segundo plano durante el arranque.
 
 # =============== PARÁMETROS GLOBALES DE LA SIMULACIÓN ==================
 # Define las dimensiones de la grilla de simulación. Una grilla más grande implica más detalle pero mayor coste computacional.
@@ -48,12 +51,18 @@ QUEMADO = 3     # La celda ya se ha quemado y no puede volver a incendiarse.
 # Un diccionario que asocia cada estado de celda con un color específico para su representación visual.
 # Los colores están en formato RGBA (Rojo, Verde, Azul, Alfa/Transparencia).
 COLORES = {
-    VACIO: (255, 255, 255),          # Blanco para celdas vacías (no se dibuja).
+    VACIO: (255, 255, 255, 0),       # Blanco totalmente transparente para celdas vacías (no se dibuja).
     VEGETACION: (34, 139, 34, 25),   # Verde semitransparente para la vegetación.
     FUEGO: (255, 0, 0, 255),         # Rojo sólido para el fuego.
     QUEMADO: (255, 165, 0, 255)      # Naranja sólido para el área quemada.
 }
 
+# Tablas de colores (LUT) indexables directamente por la grilla de estados.
+# PALETA_RGB[grilla] produce de una sola vez el array (alto, ancho, 3) con el
+# color de cada celda, sin recorrerlas una por una en Python.
+PALETA_RGB = np.array([COLORES[e][:3] for e in (VACIO, VEGETACION, FUEGO, QUEMADO)], dtype=np.uint8)
+PALETA_ALFA = np.array([COLORES[e][3] for e in (VACIO, VEGETACION, FUEGO, QUEMADO)], dtype=np.uint8)
+
 # =============== CARGA DE DATOS GEOGRÁFICOS =====================
 # Carga el raster de pendientes y lo redimensiona para que coincida con la grilla de la simulación.
 # La pendiente es un factor clave en la propagación del fuego.
@@ -86,7 +95,10 @@ def generar_grilla():
     # Carga el raster SAVI. Las áreas con un valor SAVI superior al umbral se consideran vegetación.
     vegetacion = cargar_savi("datos/savi_capilla.tif", shape=(grid_size, grid_size), umbral=0.65)
     # Crea una grilla inicial donde todas las celdas son VACIO.
-    grilla = np.full((grid_size, grid_size), VACIO)
+    # Los estados caben en un byte (0..3): con np.int8 la grilla ocupa 8 veces
+    # menos que con el int64 por defecto, y el kernel de propagación, limitado
+    # por ancho de banda de memoria, mueve 8 veces menos datos por pasada.
+    grilla = np.full((grid_size, grid_size), VACIO, dtype=np.int8)
     # Asigna el estado VEGETACION a las celdas donde el mapa SAVI indica presencia de vegetación.
     grilla[vegetacion == 1] = VEGETACION
     return grilla
@@ -108,31 +120,63 @@ def latlon_a_indices(lat, lon, path_tif, grid_size):
     return x, y
 
 
-def viento_24h(lat, lon):
+# Plantilla de la URL de la API con las coordenadas y los parámetros deseados (viento horario a 10m).
+_URL_VIENTO = ("https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
+               "&hourly=winddirection_10m,windspeed_10m&timezone=America%2FSao_Paulo")
+# Timeout de la petición: 3 s para conectar y 5 s para leer la respuesta,
+# de modo que una red lenta no cuelgue el arranque de la simulación.
+_TIMEOUT_VIENTO = (3, 5)
+# Un único hilo alcanza: solo se descarga un pronóstico por corrida.
+_executor_viento = ThreadPoolExecutor(max_workers=1)
+
+
+def solicitar_viento_24h(lat, lon):
+    """
+    Dispara en segundo plano la petición del pronóstico de viento y devuelve un Future.
+
+    Permite solapar la latencia de red (DNS, TLS, respuesta de la API) con el
+    resto del arranque: exportar el punto de inicio, inicializar Pygame, etc.
+    """
+    url = _URL_VIENTO.format(lat=lat, lon=lon)
+    return _executor_viento.submit(requests.get, url, timeout=_TIMEOUT_VIENTO)
+
+
+def viento_24h(lat, lon, futuro=None, reintentos=1):
     """
     Obtiene el pronóstico de velocidad y dirección del viento para las próximas 48 horas
     desde la API de Open-Meteo para una latitud y longitud específicas.
+
+    Si se pasa el 'futuro' devuelto por solicitar_viento_24h, se usa esa
+    respuesta ya en vuelo en lugar de pedirla de nuevo. Ante una falla se
+    reintenta con un presupuesto acotado antes de caer a los valores por defecto.
     """
-    # Construye la URL de la API con las coordenadas y los parámetros deseados (viento horario a 10m).
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&hourly=winddirection_10m,windspeed_10m&timezone=America%2FSao_Paulo"
-    try:
-        # Realiza la petición GET a la API.
-        resp = requests.get(url)
-        # Si la petición fue exitosa (código 200), procesa los datos.
-        if resp.status_code == 200:
-            data = resp.json()
-            # Extrae las listas de dirección y velocidad del viento para las primeras 48 horas.
-            direcciones = data["hourly"]["winddirection_10m"][:48]
-            velocidades = data["hourly"]["windspeed_10m"][:48]
-            return velocidades, direcciones
-        else:
-            # Si hay un error en la API, informa y devuelve valores por defecto.
-            print("⚠️ Error al conectar con Open-Meteo. Usando datos por defecto.")
-            return [5] * 48, [90] * 48  # Viento constante de 5 km/h desde el Este (90°).
-    except requests.exceptions.ConnectionError:
-        # Si hay un error de conexión de red, informa y devuelve valores por defecto.
-        print("⚠️ Error de conexión. Verifique su red. Usando datos por defecto.")
-        return [5] * 48, [90] * 48
+    resp = None
+    # Primero intenta cosechar la petición lanzada en segundo plano.
+    if futuro is not None:
+        try:
+            resp = futuro.result(timeout=10)
+        except Exception:
+            resp = None
+    # Presupuesto de reintentos directos si no hubo respuesta todavía.
+    intento = 0
+    while resp is None and intento <= reintentos:
+        intento += 1
+        try:
+            resp = requests.get(_URL_VIENTO.format(lat=lat, lon=lon), timeout=_TIMEOUT_VIENTO)
+        except requests.exceptions.RequestException:
+            resp = None
+
+    # Si la petición fue exitosa (código 200), procesa los datos.
+    if resp is not None and resp.status_code == 200:
+        data = resp.json()
+        # Extrae las listas de dirección y velocidad del viento para las primeras 48 horas.
+        direcciones = data["hourly"]["winddirection_10m"][:48]
+        velocidades = data["hourly"]["windspeed_10m"][:48]
+        return velocidades, direcciones
+
+    # Si hay un error en la API o de conexión, informa y devuelve valores por defecto.
+    print("⚠️ Error al conectar con Open-Meteo. Usando datos por defecto.")
+    return [5] * 48, [90] * 48  # Viento constante de 5 km/h desde el Este (90°).
 
 
 def exportar_shapefile(grilla):
@@ -147,17 +191,16 @@ def exportar_shapefile(grilla):
     # Crea una transformación afín que mapea los índices de la grilla (0, 600) a coordenadas del mundo real.
     transform = from_bounds(bounds.left, bounds.bottom, bounds.right, bounds.top, grilla.shape[1], grilla.shape[0])
 
-    celdas_quemadas = []
-    # Itera sobre cada celda de la grilla final.
-    for y in range(grilla.shape[0]):
-        for x in range(grilla.shape[1]):
-            # Si una celda está QUEMADA...
-            if grilla[y, x] == QUEMADO:
-                # ...transforma sus coordenadas de grilla a coordenadas geográficas para definir un polígono.
-                x0, y0 = transform * (x, y)
-                x1, y1 = transform * (x + 1, y + 1)
-                poligono = Polygon([(x0, y0), (x1, y0), (x1, y1), (x0, y1)])
-                celdas_quemadas.append(poligono)
+    # Máscara binaria de celdas quemadas. rasterio.features.shapes la recorre
+    # en C y emite directamente polígonos ya fusionados por zonas contiguas,
+    # aplicando la transformación afín de una sola vez: evita los 360k
+    # productos afines y los 360k Polygon de una celda que se creaban antes.
+    mascara = (grilla == QUEMADO).astype(np.uint8)
+    celdas_quemadas = [
+        shape(geom)
+        for geom, valor in shapes(mascara, mask=mascara.astype(bool), transform=transform)
+        if valor == 1
+    ]
 
     # Si no se encontraron celdas quemadas, no se exporta nada.
     if not celdas_quemadas:
@@ -165,7 +208,9 @@ def exportar_shapefile(grilla):
         return
 
     # Une todos los polígonos individuales en una única geometría (multi-polígono).
-    area_total = gpd.GeoSeries(celdas_quemadas).unary_union
+    # shapely.ops.unary_union trabaja directamente sobre la lista en GEOS, sin el
+    # costo de envolver cada geometría en una GeoSeries solo para unirla.
+    area_total = unary_union(celdas_quemadas)
     # Crea un GeoDataFrame de Geopandas con la geometría unificada y el sistema de coordenadas correcto.
     gdf = gpd.GeoDataFrame(geometry=[area_total], crs=crs)
     # Guarda el GeoDataFrame como un archivo Shapefile.
@@ -173,27 +218,6 @@ def exportar_shapefile(grilla):
     print("✅ Shapefile del área quemada exportado correctamente.")
 
 
-def exportar_video():
-    """
-    Crea un video MP4 a partir de los fotogramas (frames) guardados durante la simulación.
-    """
-    # Obtiene una lista ordenada de todos los archivos de imagen guardados en la carpeta de frames.
-    frame_files = sorted([f"outputs/frames/{f}" for f in os.listdir("outputs/frames") if f.endswith(".png")])
-    # Si no hay frames, no hace nada.
-    if not frame_files:
-        return
-    # Lee el primer frame para obtener las dimensiones del video.
-    frame = cv2.imread(frame_files[0])
-    height, width, _ = frame.shape
-    # Inicializa el objeto para escribir el video (formato MP4, 2 fotogramas por segundo, dimensiones).
-    out = cv2.VideoWriter("outputs/simulacion_incendio.mp4", cv2.VideoWriter_fourcc(*"mp4v"), 2, (width, height))
-    # Itera sobre cada archivo de frame y lo escribe en el video.
-    for f in frame_files:
-        out.write(cv2.imread(f))
-    # Libera el objeto de video, finalizando el proceso de escritura.
-    out.release()
-
-
 def main():
     """
     Función principal que orquesta toda la simulación.
@@ -215,8 +239,9 @@ def main():
         cx, cy = grid_size // 2, grid_size // 2
         lat, lon = -29.116495309469578, -67.61160108079707
 
-    # Obtiene los datos de viento para las coordenadas de inicio.
-    velocidades, direcciones = viento_24h(lat, lon)
+    # Dispara la descarga del viento en segundo plano: la petición viaja por
+    # la red mientras se exporta el punto de inicio y se inicializa Pygame.
+    futuro_viento = solicitar_viento_24h(lat, lon)
 
     # Crea un punto geográfico para el inicio del fuego y lo exporta como un Shapefile.
     punto_inicio = Point(lon, lat)
@@ -233,10 +258,21 @@ def main():
     # Carga una fuente para mostrar texto en pantalla.
     font = pygame.font.SysFont(None, 28)
 
-    # Crea el directorio para guardar los fotogramas si no existe.
-    os.makedirs("outputs/frames", exist_ok=True)
+    # Cosecha los datos de viento pedidos en segundo plano al comienzo.
+    velocidades, direcciones = viento_24h(lat, lon, futuro=futuro_viento)
+
+    # Crea el directorio de salidas si no existe.
+    os.makedirs("outputs", exist_ok=True)
     # Lista para almacenar las imágenes que formarán el GIF.
     imagenes = []
+    # El video MP4 se escribe de forma incremental, un fotograma por hora,
+    # directamente desde los arrays en memoria: sin PNGs intermedios ni una
+    # segunda pasada de lectura y decodificación al final.
+    video = cv2.VideoWriter("outputs/simulacion_incendio.mp4", cv2.VideoWriter_fourcc(*"mp4v"), 2, (width, height))
+
+    # Superficie con canal alfa que se rellena cada hora a partir de la grilla.
+    # Se crea una sola vez y se reutiliza en todos los fotogramas.
+    capa_estados = pygame.Surface((width, height), pygame.SRCALPHA)
 
     # Bucle principal de la simulación: se ejecuta una vez por cada hora del pronóstico (48 horas).
     for hora in range(48):
@@ -275,25 +311,20 @@ def main():
         # --- Dibujado en pantalla ---
         # Dibuja el mapa base de OSM.
         pantalla.blit(imagen_fondo, (0, 0))
-        # Crea una superficie transparente para dibujar la capa de vegetación.
-        savi_layer = pygame.Surface((width, height), pygame.SRCALPHA)
-
-        # Itera sobre cada celda para dibujarla según su estado.
-        for y in range(grid_size):
-            for x in range(grid_size):
-                estado = grilla[y, x]
-                if estado == VEGETACION:
-                    # Dibuja la vegetación en su capa semitransparente.
-                    pygame.draw.rect(savi_layer, COLORES[VEGETACION], (x, y, 1, 1))
-                elif estado == FUEGO:
-                    # Dibuja el fuego directamente sobre la pantalla principal.
-                    pygame.draw.rect(pantalla, COLORES[FUEGO], (x, y, 1, 1))
-                elif estado == QUEMADO:
-                    # Dibuja el área quemada directamente sobre la pantalla.
-                    pygame.draw.rect(pantalla, COLORES[QUEMADO], (x, y, 1, 1))
-
-        # Superpone la capa de vegetación sobre el mapa de fondo.
-        pantalla.blit(savi_layer, (0, 0))
+
+        # Colorea todas las celdas de una sola vez: las LUT de la paleta se
+        # indexan con la grilla completa y el resultado se vuelca en los arrays
+        # de píxeles de la superficie (surfarray usa orden (ancho, alto), por
+        # eso el swapaxes). Reemplaza las ~360k llamadas a pygame.draw.rect.
+        pix_rgb = pygame.surfarray.pixels3d(capa_estados)
+        pix_rgb[:] = PALETA_RGB[grilla].swapaxes(0, 1)
+        del pix_rgb  # Libera el bloqueo de la superficie antes del blit.
+        pix_alfa = pygame.surfarray.pixels_alpha(capa_estados)
+        pix_alfa[:] = PALETA_ALFA[grilla].swapaxes(0, 1)
+        del pix_alfa
+
+        # Superpone la capa de estados (vegetación, fuego y quemado) sobre el fondo.
+        pantalla.blit(capa_estados, (0, 0))
 
         # Dibuja la información de texto en pantalla (hora y datos del viento).
         texto = font.render(f"Hora: {hora}", True, (255, 255, 255))
@@ -303,7 +334,8 @@ def main():
         pantalla.blit(info_viento, (width - 290, 10))
 
         # Dibuja una flecha para indicar la dirección e intensidad del viento.
-        vx, vy = direccion_vector(viento_dir)
+        # Reutiliza el vector ya calculado para la propagación de esta hora.
+        vx, vy = viento
         longitud = int(viento_vel * 3) # La longitud de la flecha es proporcional a la velocidad.
         inicio = (width - 120, 60)
         fin = (inicio[0] + vx * longitud, inicio[1] - vy * longitud)
@@ -314,22 +346,22 @@ def main():
         # Actualiza la pantalla para mostrar todo lo que se ha dibujado.
         pygame.display.flip()
 
-        # Guarda el fotograma actual como una imagen PNG.
-        path_img = f"outputs/frames/frame_{hora:02d}.png"
-        pygame.image.save(pantalla, path_img)
-        # Añade la imagen a la lista para el GIF.
-        imagenes.append(imageio.imread(path_img))
+        # Captura el fotograma una sola vez desde la memoria de video y lo
+        # reutiliza para las dos salidas: el GIF (RGB) y el video (BGR).
+        frame_rgb = pygame.surfarray.array3d(pantalla).swapaxes(0, 1)
+        imagenes.append(frame_rgb)
+        video.write(cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR))
         # Pequeña pausa para que la simulación no vaya demasiado rápido.
         pygame.time.wait(500)
 
     # --- Finalización y exportación de resultados ---
     print("Exportando resultados...")
+    # Cierra el video MP4, que ya se escribió hora a hora durante el bucle.
+    video.release()
     # Crea y guarda el GIF animado.
     imageio.mimsave("outputs/simulacion_incendio.gif", imagenes, duration=1)
     # Exporta el área quemada como Shapefile.
     exportar_shapefile(grilla)
-    # Exporta la simulación como video MP4.
-    exportar_video()
     print("✅ GIF, SHP y MP4 generados correctamente en la carpeta /outputs.")
 
     # Cierra Pygame y termina el script.
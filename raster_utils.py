@@ -27,30 +27,32 @@ def cargar_raster(path, shape=(100, 100)):
         # 'resampling=Resampling.bilinear' especifica el algoritmo para el redimensionado.
         # La interpolación bilineal es una buena opción para datos continuos (como la pendiente),
         # ya que calcula el valor de cada nuevo píxel basándose en un promedio ponderado de los 4 píxeles más cercanos del original.
+        # Se convierte de entrada a float32: la mitad de memoria y de ancho de
+        # banda que el float64, con precisión de sobra para valores normalizados
+        # en [0, 1] que solo ponderan una probabilidad.
         array = src.read(
             1,
             out_shape=(shape[0], shape[1]),
             resampling=Resampling.bilinear
-        )
-    
+        ).astype(np.float32, copy=False)
+
     # Los rasters a menudo contienen valores 'NoData' (sin datos) que se leen como 'NaN' (Not a Number).
-    # 'np.nan_to_num' reemplaza todas las ocurrencias de NaN con un valor específico, en este caso 0.0.
-    # Esto es crucial para evitar errores en cálculos matemáticos posteriores.
-    array = np.nan_to_num(array, nan=0.0)
-    
+    # 'np.nan_to_num' con copy=False reemplaza los NaN por 0.0 sobre el mismo buffer,
+    # sin reservar un array nuevo. Esto es crucial para evitar errores en cálculos posteriores.
+    array = np.nan_to_num(array, nan=0.0, copy=False)
+
     # Se realiza una normalización min-max para escalar todos los valores del array al rango [0, 1].
-    # La fórmula es: (valor - mínimo) / (máximo - mínimo).
-    # Esto es importante para que diferentes factores (como pendiente y viento) contribuyan de forma ponderada
-    # y comparable en la fórmula de probabilidad de propagación del fuego.
-    # Se añade una pequeña constante (epsilon) al denominador para evitar la división por cero si todos los valores son iguales.
+    # La fórmula es: (valor - mínimo) / (máximo - mínimo), aplicada con operaciones
+    # in situ (out=array, *=) para no materializar arrays temporales intermedios:
+    # el raster completo se recorre una sola vez por operación y nada se re-asigna.
+    # Si todos los valores son iguales (rango cero), el array queda tal cual tras restar
+    # el mínimo: todo ceros, el mismo resultado que antes sin reservar otra grilla.
     min_val = array.min()
-    max_val = array.max()
-    if (max_val - min_val) > 0:
-        array = (array - min_val) / (max_val - min_val)
-    else:
-        # Si todos los valores son iguales, el array normalizado será todo ceros.
-        array = np.zeros(shape)
-        
+    rango = np.ptp(array)
+    np.subtract(array, min_val, out=array)
+    if rango > 0:
+        array *= np.float32(1.0 / rango)
+
     return array
 
 def cargar_savi(path, shape=(100, 100), umbral=0.2):
@@ -75,21 +77,22 @@ def cargar_savi(path, shape=(100, 100), umbral=0.2):
             1,
             out_shape=shape,
             resampling=Resampling.bilinear
-        )
-        
-    # Reemplaza los valores 'NoData' por 0.
-    savi = np.nan_to_num(savi, nan=0.0)
-    
-    # Normaliza los valores del SAVI al rango [0, 1] para que el umbral sea consistente.
+        ).astype(np.float32, copy=False)
+
+    # Reemplaza los valores 'NoData' por 0 sobre el mismo buffer.
+    savi = np.nan_to_num(savi, nan=0.0, copy=False)
+
+    # Normaliza los valores del SAVI al rango [0, 1] para que el umbral sea consistente,
+    # con la misma normalización in situ (sin temporales) que en cargar_raster.
     min_val = savi.min()
-    max_val = savi.max()
-    if (max_val - min_val) > 0:
-        savi = (savi - min_val) / (max_val - min_val)
-    else:
-        savi = np.zeros(shape)
+    rango = np.ptp(savi)
+    np.subtract(savi, min_val, out=savi)
+    if rango > 0:
+        savi *= np.float32(1.0 / rango)
 
     # Este es el paso clave: la binarización.
     # (savi > umbral) crea una matriz booleana (True/False).
-    # .astype(int) convierte esa matriz booleana a una matriz de enteros, donde True se convierte en 1 y False en 0.
-    # El resultado es una grilla que representa directamente dónde hay vegetación (1) y dónde no (0).
-    return (savi > umbral).astype(int)
\ No newline at end of file
+    # .astype(np.int8) convierte esa matriz booleana a enteros de un byte, donde True se convierte en 1 y False en 0.
+    # El resultado es una grilla que representa directamente dónde hay vegetación (1) y dónde no (0),
+    # con el mismo dtype compacto que la grilla de estados de la simulación.
+    return (savi > umbral).astype(np.int8)
\ No newline at end of file